@@ -1,221 +1,111 @@
-import functools
 from timeit import default_timer
+import functools
 import heapq
 import math
+import multiprocessing
 import operator
-
-
-def p_adic_valuation(n, p):
-    exponent = 0
-    while n % p == 0 and n != 0:
-        n //= p
-        exponent += 1
-    return exponent
-
-
-@functools.cache
-def integer_partitions(n):
-    if n == 0:
-        return {()}
-    answer = {(n,)}
-    for x in range(1, n):
-        for y in integer_partitions(n - x):
-            answer.add(tuple(sorted((x,) + y)))
-    return answer
-
-
-def partition_order(partition, orientation_count):
-    lcm = math.lcm(*partition)
-    if orientation_count == 1:
-        return lcm
-    order = lcm
-
-    always_orient = None
-    critical_orient = None
-    max_p_adic_valuation = -1
-
-    for j, permutation_order in enumerate(partition):
-        curr_p_adic_valuation = p_adic_valuation(
-            permutation_order,
-            orientation_count,
-        )
-        if curr_p_adic_valuation > max_p_adic_valuation:
-            max_p_adic_valuation = curr_p_adic_valuation
-            critical_orient = [j]
-        elif curr_p_adic_valuation == max_p_adic_valuation:
-            critical_orient.append(j)
-        if permutation_order == 1:
-            if always_orient is None:
-                always_orient = [j]
-            else:
-                always_orient.append(j)
-
-    orient_count = 0 if always_orient is None else len(always_orient)
-    critical_is_disjoint = critical_orient is not None and (
-        always_orient is None or all(j not in always_orient for j in critical_orient)
-    )
-    if critical_is_disjoint:
-        orient_count += 1
-    unorient_critical = orient_count == len(partition) and (
-        orientation_count == 2
-        and orient_count % 2 == 1
-        or orientation_count > 2
-        and orient_count == 1
-    )
-    if unorient_critical:
-        if critical_is_disjoint:
-            return order
-        else:
-            return None
-    else:
-        if orient_count == 0:
-            return order
-        else:
-            return order * orientation_count
-
-
-def full_integer_partitions(cycle_cubie_count, orientation_count):
-    partitions = [
-        (order, partition)
-        for partition in integer_partitions(cycle_cubie_count)
-        if (order := partition_order(partition, orientation_count)) is not None
-    ]
-    partitions.sort(reverse=True, key=operator.itemgetter(0))
-    return partitions
-
-
-def reduced_integer_partitions(cycle_cubie_count, orientation_count, parity_aware):
-    partitions = full_integer_partitions(cycle_cubie_count, orientation_count)
-
-    dominated = [False] * len(partitions)
-    reduced_partitions = []
-    for i in range(len(partitions)):
-        if dominated[i]:
-            continue
-        partition = partitions[i]
-        reduced_partitions.append(partition)
-        for j in range(i + 1, len(partitions)):
-            if (
-                partition[0] % partitions[j][0] == 0
-                and partition[0] != partitions[j][0]
-                and (
-                    not parity_aware
-                    or (
-                        sum(partition[1])
-                        + len(partition[1])
-                        + sum(partitions[j][1])
-                        + len(partitions[j][1])
-                    )
-                    % 2
-                    == 0
-                )
-            ):
-                dominated[j] = True
-    return reduced_partitions
-
-
-# list of (order, partition of N)
-# example:
-# corners_constraint == [(45, (3, 5)), (36, (1, 3, 4)), (30, (1, 2, 5)), (21, (1, 7)), (18, (1, 2, 2, 3)), (18, (2, 6)), (12, (1, 1, 2, 4)), (12, (4, 4)), (8, (8,))]
-
-edges_constraint = reduced_integer_partitions(12, 2, True)
-corners_constraint = reduced_integer_partitions(8, 3, True)
-s24_noconstraint = reduced_integer_partitions(24, 1, False)
-s24_constraint = reduced_integer_partitions(24, 1, True)
-# TODO: asher and I discussed needing the full integer partitions for larger
-# cubes. this is unfortunately very very slow
-# edges_constraint = full_integer_partitions(12, 2)
-# corners_constraint = full_integer_partitions(8, 3)
-# s24_noconstraint = full_integer_partitions(24, 1)
-# s24_constraint = full_integer_partitions(24, 1)
-
-# the first element of the tuple is the index where everything then and after
-# wards are identical orbits (s24). This is used to enforce a constraint that
-# the partitions must be in ascending order for these orbits to avoid duplicates
-
-
-_3x3 = (
-    2,
-    [
-        edges_constraint,
-        corners_constraint,
-    ],
-)
-
-_4x4 = (
-    1,
-    [
-        corners_constraint,
-        s24_noconstraint,
-        s24_constraint,
-    ],
-)
-
-_5x5 = (
-    2,
-    [
-        edges_constraint,
-        corners_constraint,
-        s24_constraint,
-        s24_constraint,
-        s24_constraint,
-    ],
+from partition_tables import (
+    _3x3,  # noqa: F401
+    _4x4,  # noqa: F401
+    _5x5,
+    _6x6,  # noqa: F401
+    _7x7,  # noqa: F401
 )
 
 
-_6x6 = (
-    1,
-    [
-        corners_constraint,
-        # these *should* be s24_constraint but it's really slow :(
-        s24_noconstraint,
-        s24_noconstraint,
-        s24_noconstraint,
-        s24_noconstraint,
-        s24_noconstraint,
-        s24_noconstraint,
-    ],
-)
+def lexicographic_partition_ranks(all_reduced_integer_partitions):
+    # rank every partition lexicographically so that the ordering constraint on
+    # identical orbits is an integer comparison rather than a tuple comparison
+    return {
+        partition: rank
+        for rank, partition in enumerate(
+            sorted(
+                {
+                    partition
+                    for reduced_integer_partitions in all_reduced_integer_partitions
+                    for _, partition in reduced_integer_partitions
+                }
+            )
+        )
+    }
 
-# GOAL: make 7x7 and onwards fast
 
-_7x7 = (
-    2,
-    [
-        edges_constraint,
-        corners_constraint,
-        s24_noconstraint,
-        s24_noconstraint,
-        s24_noconstraint,
-        s24_noconstraint,
-        s24_noconstraint,
-        s24_noconstraint,
-        s24_noconstraint,
-        s24_noconstraint,
-    ],
-)
+def fail_first_orbit_order(puzzle):
+    # orbits are searched from the last index to the first, so the orbits with
+    # the fewest partitions go last to fix the running order as early as
+    # possible. the identical orbits are moved as one block so that they stay
+    # adjacent for the ordering constraint
+    identical_index, all_reduced_integer_partitions = puzzle
+    blocks = [[j] for j in range(identical_index)]
+    if identical_index < len(all_reduced_integer_partitions):
+        blocks.append(list(range(identical_index, len(all_reduced_integer_partitions))))
+    blocks.sort(
+        key=lambda block: min(len(all_reduced_integer_partitions[j]) for j in block),
+        reverse=True,
+    )
+    return [j for block in blocks for j in block]
 
 
 # big_cube is unused
-def highest_order_partitions(puzzle, debug, big_cube):
+def highest_order_partitions(
+    puzzle, debug, big_cube, root_index=None, fail_first=False
+):
     identical_index, all_reduced_integer_partitions = puzzle
+    # NOTE: fail first ordering is ~3x slower on the 6x6 with the gcd keyed
+    # heap, so it is opt in
+    if fail_first:
+        orbit_order = fail_first_orbit_order(puzzle)
+    else:
+        orbit_order = list(range(len(all_reduced_integer_partitions)))
+    all_reduced_integer_partitions = [
+        all_reduced_integer_partitions[j] for j in orbit_order
+    ]
+    # whether the orbit at each index is identical to the one searched before it
+    follows_identical = [
+        orbit_order[i] >= identical_index
+        and i + 1 < len(orbit_order)
+        and orbit_order[i + 1] >= identical_index
+        for i in range(len(orbit_order))
+    ]
     count = 0
     highest_order = -1
     rest_upper_bounds = []
     cycles = []
     rest_upper_bound = 1
 
-    for lcm_and_partition in map(
-        operator.itemgetter(0), all_reduced_integer_partitions
-    ):
+    # the partitions are sorted by descending LCM so the first is the largest
+    for reduced_integer_partitions in all_reduced_integer_partitions:
         rest_upper_bounds.append(rest_upper_bound)
-        rest_upper_bound *= lcm_and_partition[0]
+        rest_upper_bound *= reduced_integer_partitions[0][0]
+
+    partition_ranks = lexicographic_partition_ranks(all_reduced_integer_partitions)
+    all_reduced_integer_partition_ranks = [
+        [partition_ranks[partition] for _, partition in reduced_integer_partitions]
+        for reduced_integer_partitions in all_reduced_integer_partitions
+    ]
 
     heap = []
     # NOTE: heapq is not efficient! there are more efficient priority queue
     # data structures that exist (strict fibonacci heaps) but we use heapq
     # for simplicity.
-    heapq.heappush(heap, (1, len(all_reduced_integer_partitions) - 1, 1, []))
+    if root_index is None:
+        heapq.heappush(
+            heap,
+            (1, len(all_reduced_integer_partitions) - 1, 1, [], len(partition_ranks)),
+        )
+    else:
+        # only search the subtree where the last orbit uses this partition
+        lcm, partition = all_reduced_integer_partitions[-1][root_index]
+        heapq.heappush(
+            heap,
+            (
+                1,
+                len(all_reduced_integer_partitions) - 2,
+                lcm,
+                [partition],
+                all_reduced_integer_partition_ranks[-1][root_index],
+            ),
+        )
     if debug:
         t = 0
     while heap:
@@ -223,7 +113,7 @@ def highest_order_partitions(puzzle, debug, big_cube):
             if t % 10000 == 0:
                 print(f"The heap has {len(heap)} elements")
             t += 1
-        _, i, running_order, cubie_partition_objs = heapq.heappop(heap)
+        _, i, running_order, cubie_partition_objs, prev_rank = heapq.heappop(heap)
 
         if i == -1:
             if running_order > highest_order:
@@ -237,22 +127,27 @@ def highest_order_partitions(puzzle, debug, big_cube):
                 print(f"Cycles: {cycles}")
             continue
 
-        for lcm_and_partition in all_reduced_integer_partitions[i]:
+        # running_order * lcm * rest_upper_bounds[i] < highest_order, with the
+        # division hoisted out of the loop. the partitions are sorted by
+        # descending LCM so once this fails it fails for the rest
+        threshold = -(-highest_order // rest_upper_bounds[i])
+        for lcm_and_partition, rank in zip(
+            all_reduced_integer_partitions[i], all_reduced_integer_partition_ranks[i]
+        ):
             count += 1
             lcm, partition = lcm_and_partition
             rest_upper_bound = running_order * lcm
-            if rest_upper_bound * rest_upper_bounds[i] < highest_order:
+            if rest_upper_bound < threshold:
                 break
             gcd = math.gcd(running_order, lcm)
             if (
                 # does the current index refer to an identical orbit (s24)
-                i >= identical_index
+                follows_identical[i]
                 # if so, then enforce p1 < p2 < p3 ... < pn for all partitions
                 # to ensure no duplicates are generated. It is assumed that the
                 # caller will manually permute these identical partitions/
                 # TODO: how should duplicates be handled?
-                and cubie_partition_objs
-                and partition > cubie_partition_objs[0]
+                and rank > prev_rank
             ):
                 continue
             heapq.heappush(
@@ -268,22 +163,194 @@ def highest_order_partitions(puzzle, debug, big_cube):
                     # every iteration, but I will leave it like this for the sake
                     # of not making the code more complicated than it already is
                     [partition] + cubie_partition_objs,
+                    # ties are already broken by the list above, so this is
+                    # never compared by the heap
+                    rank,
                 ),
             )
     print(f"Took {count} loop iterations")
+    orbit_positions = [orbit_order.index(j) for j in range(len(orbit_order))]
+    return highest_order, [
+        [cubie_partition_objs[k] for k in orbit_positions]
+        for cubie_partition_objs in cycles
+    ]
+
+
+# root_index indexes the partitions of the first orbit searched, which is the
+# last orbit of the search order
+def highest_order_partitions_from_root(puzzle, root_index, fail_first):
+    return highest_order_partitions(puzzle, False, False, root_index, fail_first)
+
+
+def parallel_highest_order_partitions(puzzle, processes=None, fail_first=False):
+    # every partition of the first orbit searched roots an independent subtree,
+    # so each one is searched in its own process. the workers do not share
+    # their highest order, so each one only prunes against what it has found
+    # itself
+    root_orbit = fail_first_orbit_order(puzzle)[-1] if fail_first else -1
+    with multiprocessing.Pool(processes) as pool:
+        all_results = pool.starmap(
+            highest_order_partitions_from_root,
+            [(puzzle, j, fail_first) for j in range(len(puzzle[1][root_orbit]))],
+        )
+    highest_order = max(map(operator.itemgetter(0), all_results))
+    cycles = [
+        cycle
+        for order, root_cycles in all_results
+        if order == highest_order
+        for cycle in root_cycles
+    ]
     return highest_order, cycles
 
 
-WRITE_TO_FILE = True
+def stack_highest_order_partitions(puzzle):
+    """
+    Depth first version of `highest_order_partitions` that keeps its state in
+    preallocated per orbit arrays instead of allocating a heap entry and a new
+    path list for every node.
+    """
+    identical_index, all_reduced_integer_partitions = puzzle
+    orbit_count = len(all_reduced_integer_partitions)
+    partition_ranks = lexicographic_partition_ranks(all_reduced_integer_partitions)
+    all_reduced_integer_partition_ranks = [
+        [partition_ranks[partition] for _, partition in reduced_integer_partitions]
+        for reduced_integer_partitions in all_reduced_integer_partitions
+    ]
+    rest_upper_bounds = []
+    rest_upper_bound = 1
+    for reduced_integer_partitions in all_reduced_integer_partitions:
+        rest_upper_bounds.append(rest_upper_bound)
+        rest_upper_bound *= reduced_integer_partitions[0][0]
+
+    highest_order = -1
+    cycles = []
+    # the partition index chosen for and the running order after each orbit.
+    # running_orders has one extra slot for the order before any orbit
+    partition_indicies = [-1] * orbit_count
+    running_orders = [1] * (orbit_count + 1)
+    i = orbit_count - 1
+    while i < orbit_count:
+        reduced_integer_partitions = all_reduced_integer_partitions[i]
+        running_order = running_orders[i + 1]
+        threshold = -(-highest_order // rest_upper_bounds[i])
+        k = partition_indicies[i] + 1
+        while k < len(reduced_integer_partitions):
+            lcm = reduced_integer_partitions[k][0]
+            if running_order * lcm < threshold:
+                k = len(reduced_integer_partitions)
+                break
+            if (
+                i >= identical_index
+                and i + 1 < orbit_count
+                and all_reduced_integer_partition_ranks[i][k]
+                > all_reduced_integer_partition_ranks[i + 1][partition_indicies[i + 1]]
+            ):
+                k += 1
+                continue
+            break
+        if k == len(reduced_integer_partitions):
+            # exhausted, backtrack to the previous orbit
+            partition_indicies[i] = -1
+            i += 1
+            continue
+        partition_indicies[i] = k
+        running_orders[i] = math.lcm(running_order, lcm)
+        if i != 0:
+            i -= 1
+            continue
+        if running_orders[0] > highest_order:
+            highest_order = running_orders[0]
+            cycles.clear()
+        if running_orders[0] == highest_order:
+            cycles.append(
+                [
+                    all_reduced_integer_partitions[j][partition_indicies[j]][1]
+                    for j in range(orbit_count)
+                ]
+            )
+    return highest_order, cycles
 
-start = default_timer()
-results = highest_order_partitions(_5x5, True, False)
-end = default_timer() - start
-print(f"Generated {len(results[1])} unique results in {end:.3g}s")
-if WRITE_TO_FILE:
-    with open("output.py", "w") as f:
-        f.write(
-            f"# Highest order: {results[0]}\n# Run `python -i output.py`\n\nresults = {results[1]}"
+
+@functools.cache
+def specialized_highest_order_partitions(puzzle):
+    """
+    Generate a depth first version of `highest_order_partitions` for one
+    puzzle, with a nested loop per orbit and the upper bounds and identical
+    orbit checks written out as constants.
+    """
+    identical_index, all_reduced_integer_partitions = puzzle
+    partition_ranks = lexicographic_partition_ranks(all_reduced_integer_partitions)
+    namespace = {"gcd": math.gcd}
+    lines = [
+        "def search():",
+        "    highest_order = -1",
+        "    cycles = []",
+    ]
+    indent = "    "
+    running_order = "1"
+    rest_upper_bound = math.prod(
+        reduced_integer_partitions[0][0]
+        for reduced_integer_partitions in all_reduced_integer_partitions
+    )
+    for i in range(len(all_reduced_integer_partitions) - 1, -1, -1):
+        namespace[f"partitions_{i}"] = tuple(
+            (lcm, partition, partition_ranks[partition])
+            for lcm, partition in all_reduced_integer_partitions[i]
         )
-else:
-    print(f"\nHighest order: {results[0]}\n{results[1]}")
+        rest_upper_bound //= all_reduced_integer_partitions[i][0][0]
+        lines += [
+            f"{indent}for lcm_{i}, partition_{i}, rank_{i} in partitions_{i}:",
+            f"{indent}    if {running_order} * lcm_{i} * {rest_upper_bound} < highest_order:",
+            f"{indent}        break",
+        ]
+        indent += "    "
+        if i >= identical_index and i + 1 < len(all_reduced_integer_partitions):
+            lines += [
+                f"{indent}if rank_{i} > rank_{i + 1}:",
+                f"{indent}    continue",
+            ]
+        lines.append(
+            f"{indent}order_{i} = {running_order} * lcm_{i} // gcd({running_order}, lcm_{i})"
+        )
+        running_order = f"order_{i}"
+    partitions = ", ".join(
+        f"partition_{i}" for i in range(len(all_reduced_integer_partitions))
+    )
+    lines += [
+        f"{indent}if order_0 > highest_order:",
+        f"{indent}    highest_order = order_0",
+        f"{indent}    cycles.clear()",
+        f"{indent}if order_0 == highest_order:",
+        f"{indent}    cycles.append([{partitions}])",
+        "    return highest_order, cycles",
+    ]
+    exec("\n".join(lines), namespace)
+    return namespace["search"]
+
+
+WRITE_TO_FILE = True
+# one of "specialized", "parallel", "stack" or "heap"
+SEARCH = "specialized"
+
+if __name__ == "__main__":
+    start = default_timer()
+    match SEARCH:
+        case "specialized":
+            results = specialized_highest_order_partitions(_5x5)()
+        case "parallel":
+            results = parallel_highest_order_partitions(_5x5)
+        case "stack":
+            results = stack_highest_order_partitions(_5x5)
+        case "heap":
+            results = highest_order_partitions(_5x5, True, False)
+        case _:
+            raise ValueError(f"Unknown search {SEARCH}")
+    end = default_timer() - start
+    print(f"Generated {len(results[1])} unique results in {end:.3g}s")
+    if WRITE_TO_FILE:
+        with open("output.py", "w") as f:
+            f.write(
+                f"# Highest order: {results[0]}\n# Run `python -i output.py`\n\nresults = {results[1]}"
+            )
+    else:
+        print(f"\nHighest order: {results[0]}\n{results[1]}")
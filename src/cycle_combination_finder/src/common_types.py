@@ -1,6 +1,6 @@
-import collections
 import dataclasses
 import enum
+import typing
 
 
 class OrientationSumConstraint(enum.Enum):
@@ -9,37 +9,26 @@ class OrientationSumConstraint(enum.Enum):
 
 
 class OrientationStatus:
-    @dataclasses.dataclass(frozen=True)
+    @dataclasses.dataclass(frozen=True, slots=True)
     class CannotOrient:
         pass
 
-    @dataclasses.dataclass(frozen=True, unsafe_hash=True)
+    @dataclasses.dataclass(frozen=True, slots=True)
     class CanOrient:
         count: int
         sum_constraint: OrientationSumConstraint
 
 
-PuzzleOrbitDefinition = collections.namedtuple(
-    "PuzzleOrbitDefinition",
-    [
-        "orbits",
-        "even_parity_constraints",
-    ],
-)
-
-
-Orbit = collections.namedtuple(
-    "Orbit",
-    [
-        "name",
-        "cubie_count",
-        "orientation_status",
-    ],
-)
-
-EvenParityConstraint = collections.namedtuple(
-    "EqualPermutationCombinations",
-    [
-        "orbit_names",
-    ],
-)
+class PuzzleOrbitDefinition(typing.NamedTuple):
+    orbits: "tuple[Orbit, ...]"
+    even_parity_constraints: "tuple[EvenParityConstraint, ...]"
+
+
+class Orbit(typing.NamedTuple):
+    name: str
+    cubie_count: int
+    orientation_status: OrientationStatus.CannotOrient | OrientationStatus.CanOrient
+
+
+class EvenParityConstraint(typing.NamedTuple):
+    orbit_names: tuple[str, ...]
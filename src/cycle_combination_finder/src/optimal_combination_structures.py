@@ -4,13 +4,16 @@ orders. The output of this phase is directly used in the CCS.
 """
 
 import collections
+import concurrent.futures
 import dataclasses
 import enum
 import itertools
 import math
+import multiprocessing
 import operator
+import pickle
 import functools
-import timeit
+import time
 import puzzle_orbit_definitions
 from common_types import (
     OrientationStatus,
@@ -20,49 +23,51 @@ from common_types import (
     EvenParityConstraint,  # noqa: F401
 )
 
-CycleCombination = collections.namedtuple(
-    "CycleCombination",
-    [
-        "used_cubie_counts",
-        "order_product",
-        "share_orders",
-        "cycle_combination",
-    ],
-)
 
-Cycle = collections.namedtuple(
-    "Cycle",
-    [
-        "order",
-        "share",
-        "partition_objs",
-    ],
-)
+@dataclasses.dataclass(frozen=True, slots=True)
+class CycleCombination:
+    used_cubie_counts: tuple[int, ...]
+    order_product: int
+    share_orders: tuple[tuple[tuple[bool, ...], ...], ...]
+    cycle_combination: "list[Cycle]"
 
-CubiePartition = collections.namedtuple(
-    "CubiePartition",
-    [
-        "name",
-        "partition",
-        "order",
-        "always_orient",
-        "critical_orient",
-    ],
-)
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class Cycle:
+    order: int
+    # bit i is set when the cycle shares the orientation of orbit i
+    share: int
+    # bit i is set when the partition of orbit i has a cycle of length 1
+    has_one: int
+    partition_objs: "tuple[CubiePartition, ...]"
+    # the partition of each of partition_objs, for cheap comparisons
+    partitions: tuple[tuple[int, ...], ...]
+
+
+@dataclasses.dataclass(frozen=True, slots=True)
+class CubiePartition:
+    name: str
+    partition: tuple[int, ...]
+    order: int
+    always_orient: list[int] | None
+    critical_orient: list[int] | None
+    sign: int
 
 
 # EvenParityConstraintsHelper = collections.namedtuple(
 #     "EvenParityConstraintsHelper",
 #     [
 #         "first_constraint_indicies",
-#         "rest_constraint_flags",
+#         "orbit_constraint_masks",
 #         "constraint_orbit_flags",
 #     ],
 # )
 @dataclasses.dataclass(frozen=True, unsafe_hash=True)
 class EvenParityConstraintsHelper:
     first_constraint_indicies: tuple[int]
-    rest_constraint_flags: tuple[tuple[bool]]
+    # bit c of the mask of an orbit is set if the orbit is in the constraint
+    # whose first index is first_constraint_indicies[c]
+    orbit_constraint_masks: tuple[int]
     constraint_orbit_flags: tuple[bool]
 
     @classmethod
@@ -105,17 +110,20 @@ class EvenParityConstraintsHelper:
         )
 
         first_constraint_indicies = []
-        all_rest_constraint_flags = []
-        for (
-            first_index_and_rest_constraint_flags
-        ) in all_first_index_and_rest_constraint_flags:
+        orbit_constraint_masks = [0] * len(puzzle_orbit_definition.orbits)
+        for c, first_index_and_rest_constraint_flags in enumerate(
+            all_first_index_and_rest_constraint_flags
+        ):
             first_index, rest_constraint_flags = first_index_and_rest_constraint_flags
             first_constraint_indicies.append(first_index)
-            all_rest_constraint_flags.append(rest_constraint_flags)
+            orbit_constraint_masks[first_index] |= 1 << c
+            for j, rest_constraint_flag in enumerate(rest_constraint_flags):
+                if rest_constraint_flag:
+                    orbit_constraint_masks[first_index + 1 + j] |= 1 << c
 
         return cls(
             first_constraint_indicies=tuple(first_constraint_indicies),
-            rest_constraint_flags=tuple(all_rest_constraint_flags),
+            orbit_constraint_masks=tuple(orbit_constraint_masks),
             constraint_orbit_flags=tuple(constraint_orbit_flags),
         )
 
@@ -141,26 +149,125 @@ def integer_partitions(n):
     to integer partitions, this can also be thought of as a representation of the
     conjugacy classes of those symmetric groups.
 
-    Taken from <https://stackoverflow.com/a/10036764/12230735>.
+    Each partition is generated exactly once, in ascending order, with Kelleher's
+    ascending composition algorithm. Taken from
+    <https://jeromekelleher.net/generating-integer-partitions.html>.
     """
     if n == 0:
-        return {()}
-    answer = {(n,)}
-    for x in range(1, n):
-        for y in integer_partitions(n - x):
-            answer.add(tuple(sorted((x,) + y)))
-    return answer
+        return ((),)
+    partitions = []
+    a = [0] * (n + 1)
+    k = 1
+    a[1] = n
+    while k != 0:
+        x = a[k - 1] + 1
+        y = a[k] - 1
+        k -= 1
+        while x <= y:
+            a[k] = x
+            y -= x
+            k += 1
+        a[k] = x + y
+        partitions.append(tuple(a[: k + 1]))
+    return tuple(partitions)
 
 
-# https://stackoverflow.com/a/6285330/12230735
-def unique_permutations(iterable, r=None):
-    previous = ()
-    for p in itertools.permutations(sorted(iterable), r):
-        if p > previous:
-            previous = p
-            yield p
+@functools.cache
+def integer_partitions_with_max_parts(n, max_parts):
+    """
+    Find the integer partitions of n with at most max_parts parts, in the same
+    order as integer_partitions. Partitions with too many parts are never built
+    rather than being filtered out afterwards.
+    """
+    return tuple(ascending_partitions_with_max_parts(n, max_parts, 1))
+
+
+def ascending_partitions_with_max_parts(n, max_parts, min_part):
+    if n == 0:
+        yield ()
+        return
+    if max_parts > 1:
+        # the rest of the partition must be at least as large as its first part
+        for first_part in range(min_part, n // 2 + 1):
+            for rest in ascending_partitions_with_max_parts(
+                n - first_part, max_parts - 1, first_part
+            ):
+                yield (first_part,) + rest
+    if max_parts != 0:
+        yield (n,)
+
+
+def unique_cycle_cubie_counts(all_partition_cubie_counts, cycle_cubie_counts=None):
+    """
+    Find every distinct way to zip the equal length partitions of each orbit into
+    cycles, as tuples of the cubie counts of each cycle in descending order.
+
+    Rather than permuting every partition and deduplicating the sorted results,
+    the cycles are built up one orbit at a time already in descending order.
+    Cycles that are equal so far are interchangeable, so each group of them only
+    receives the next orbit's cubie counts in descending order. This yields each
+    tuple exactly once.
+    """
+    if cycle_cubie_counts is None:
+        cycle_cubie_counts = ((),) * len(all_partition_cubie_counts[0])
+    if len(all_partition_cubie_counts) == 0:
+        yield cycle_cubie_counts
+        return
+    cubie_count_multiplicities = collections.Counter(all_partition_cubie_counts[0])
+    cubie_counts = sorted(cubie_count_multiplicities, reverse=True)
+    counts = [cubie_count_multiplicities[cubie_count] for cubie_count in cubie_counts]
+    group_sizes = [
+        len(list(group)) for _, group in itertools.groupby(cycle_cubie_counts)
+    ]
+    for next_cubie_counts in grouped_descending_sub_multisets(
+        cubie_counts, counts, group_sizes
+    ):
+        yield from unique_cycle_cubie_counts(
+            all_partition_cubie_counts[1:],
+            tuple(
+                cycle_cubie_count + (next_cubie_count,)
+                for cycle_cubie_count, next_cubie_count in zip(
+                    cycle_cubie_counts, next_cubie_counts
+                )
+            ),
+        )
+
+
+def grouped_descending_sub_multisets(values, counts, group_sizes, group_index=0):
+    """
+    Split the multiset of values, where values[i] occurs counts[i] times, into
+    consecutive groups of the given sizes, each in descending order.
+    """
+    if group_index == len(group_sizes):
+        yield ()
+        return
+    for group in descending_sub_multisets(values, counts, group_sizes[group_index]):
+        for rest_groups in grouped_descending_sub_multisets(
+            values, counts, group_sizes, group_index + 1
+        ):
+            yield group + rest_groups
 
 
+def descending_sub_multisets(values, counts, size, start=0):
+    """
+    Find every sub multiset of the given size, in descending order, from the
+    multiset of values sorted in descending order where values[i] occurs counts[i]
+    times. The counts are temporarily decremented by what is taken while each sub
+    multiset is being yielded.
+    """
+    if size == 0:
+        yield ()
+        return
+    for i in range(start, len(values)):
+        count = counts[i]
+        for taken in range(min(count, size), 0, -1):
+            counts[i] = count - taken
+            for rest in descending_sub_multisets(values, counts, size - taken, i + 1):
+                yield (values[i],) * taken + rest
+        counts[i] = count
+
+
+@functools.cache
 def p_adic_valuation(n, p):
     """
     Calculate the [p-adic valuation](https://en.wikipedia.org/wiki/P-adic_valuation).
@@ -172,281 +279,367 @@ def p_adic_valuation(n, p):
     return exponent
 
 
+@functools.cache
+def partition_lcm(partition):
+    """
+    Calculate the order of a permutation with the given cycle lengths.
+    """
+    return math.lcm(*partition)
+
+
 @functools.cache
 def sign(partition):
     """
     Calculate the [signature](https://en.wikipedia.org/wiki/Parity_of_a_permutation)
-    of a partition, made easy by having all cycle lengths.
+    of a partition as 0 for even and 1 for odd, made easy by having all cycle
+    lengths.
     """
-    return sum(partition) - len(partition)
-
-
-def cycle_combination_dominates(this, other):
-    # A modification of the weakly dominates condition in the pareto efficient
-    # algorithm
-    different_orders = False
-    same_cycle = this.share_orders == other.share_orders
-    for this_cycle, other_cycle in zip(this.cycle_combination, other.cycle_combination):
-        if other_cycle.order > this_cycle.order:
-            return False
-        if different_orders:
-            continue
-        different_orders |= this_cycle.order > other_cycle.order
-        same_cycle &= all(
-            this_cubie_partition == other_cubie_partition
-            for this_cubie_partition, other_cubie_partition in zip(
-                map(
-                    operator.attrgetter("partition"),
-                    this_cycle.partition_objs,
-                ),
-                map(
-                    operator.attrgetter("partition"),
-                    other_cycle.partition_objs,
-                ),
-            )
-        )
+    return (sum(partition) - len(partition)) % 2
 
-    return different_orders or same_cycle
 
-
-def optimal_cycle_combinations(puzzle_orbit_definition, num_cycles, cache_clear=True):
+def optimal_cycle_combinations(
+    puzzle_orbit_definition, num_cycles, cache_clear=True, processes=1
+):
     even_parity_constraints_helper = (
         EvenParityConstraintsHelper.from_puzzle_orbit_definition(
             puzzle_orbit_definition
         )
     )
 
-    cycle_combination_objs = []
+    # a cycle must use at least this many cubies of some orbit to do anything,
+    # because a single cubie that cannot orient stays solved
+    orbit_min_cubie_counts = tuple(
+        2 if isinstance(orbit.orientation_status, OrientationStatus.CannotOrient) else 1
+        for orbit in puzzle_orbit_definition.orbits
+    )
+    # the integer partitions with at most num_cycles parts of every cubie count
+    # up to the largest orbit, padded with zeros to num_cycles parts
+    padded_integer_partitions = tuple(
+        tuple(
+            partition_cubie_counts + (0,) * (num_cycles - len(partition_cubie_counts))
+            for partition_cubie_counts in integer_partitions_with_max_parts(
+                cubie_count, num_cycles
+            )
+        )
+        for cubie_count in range(
+            max(orbit.cubie_count for orbit in puzzle_orbit_definition.orbits) + 1
+        )
+    )
+
     # TODO(pri 1/5): upper bound of LCM is math.lcm(*range(1, <max orbit cubie count> + 1))
     # TODO(pri 4/5): derive all lesser structures from max cubie count usage and fix only 1s, note that 1s are currently allowed in cannotorient orbits
     # TODO(pri 5/5): share parity
-    for used_cubie_counts in itertools.product(
+    all_used_cubie_counts = itertools.product(
         # when 0, the partition is all zeros which is disallowed later
         *(range(1, orbit.cubie_count + 1) for orbit in puzzle_orbit_definition.orbits)
+    )
+    pareto_front = ParetoFront()
+    if processes == 1:
+        for used_cubie_counts in all_used_cubie_counts:
+            for cycle_combination_obj in used_cubie_counts_cycle_combinations(
+                used_cubie_counts,
+                puzzle_orbit_definition,
+                padded_integer_partitions,
+                orbit_min_cubie_counts,
+                even_parity_constraints_helper,
+            ):
+                pareto_front.add(cycle_combination_obj)
+    else:
+        # every used cubie count is searched independently, so they are spread
+        # across processes that each warm their own caches and only send back
+        # their own pareto front. imap keeps the results in the same order as
+        # the serial search
+        with multiprocessing.Pool(
+            processes,
+            initializer=init_used_cubie_counts_worker,
+            initargs=(
+                puzzle_orbit_definition,
+                padded_integer_partitions,
+                orbit_min_cubie_counts,
+                even_parity_constraints_helper,
+            ),
+        ) as pool:
+            for used_cubie_counts_cycle_combination_objs in pool.imap(
+                worker_used_cubie_counts_cycle_combinations,
+                all_used_cubie_counts,
+                chunksize=16,
+            ):
+                for cycle_combination_obj in used_cubie_counts_cycle_combination_objs:
+                    pareto_front.add(cycle_combination_obj)
+    if cache_clear:
+        highest_order_cycles_memo.clear()
+        share_orders_from_candidates.cache_clear()
+        reduced_integer_partitions_memo.clear()
+        interned_partitions.clear()
+    return pareto_front.cycle_combination_objs()
+
+
+used_cubie_counts_worker_args = None
+
+
+def init_used_cubie_counts_worker(
+    puzzle_orbit_definition,
+    padded_integer_partitions,
+    orbit_min_cubie_counts,
+    even_parity_constraints_helper,
+):
+    # passed once per worker rather than pickled with every task so that the
+    # puzzle memos keep the same owner
+    global used_cubie_counts_worker_args
+    used_cubie_counts_worker_args = (
+        puzzle_orbit_definition,
+        padded_integer_partitions,
+        orbit_min_cubie_counts,
+        even_parity_constraints_helper,
+    )
+
+
+def worker_used_cubie_counts_cycle_combinations(used_cubie_counts):
+    return pareto_efficient_cycle_combinations(
+        used_cubie_counts_cycle_combinations(
+            used_cubie_counts, *used_cubie_counts_worker_args
+        )
+    )
+
+
+def used_cubie_counts_cycle_combinations(
+    used_cubie_counts,
+    puzzle_orbit_definition,
+    padded_integer_partitions,
+    orbit_min_cubie_counts,
+    even_parity_constraints_helper,
+):
+    num_orbits = len(puzzle_orbit_definition.orbits)
+
+    for all_partition_cubie_counts in itertools.product(
+        *map(padded_integer_partitions.__getitem__, used_cubie_counts),
     ):
-        for all_partition_cubie_counts in itertools.product(
-            *map(integer_partitions, used_cubie_counts),
+        for all_cycle_cubie_counts in unique_cycle_cubie_counts(
+            all_partition_cubie_counts
         ):
-            all_partition_cubie_counts = list(all_partition_cubie_counts)
+            # TODO(pri 5/5 blocked on derive all lesser): henry's faster impl
+            # the cycles are in descending order, so the ones too small to
+            # matter are at the end
             if any(
-                len(partition_cubie_counts) > num_cycles
-                for partition_cubie_counts in all_partition_cubie_counts
+                all(map(operator.lt, cubie_counts, orbit_min_cubie_counts))
+                for cubie_counts in reversed(all_cycle_cubie_counts)
             ):
                 continue
-            for i, partition_cubie_counts in enumerate(all_partition_cubie_counts):
-                all_partition_cubie_counts[i] += (0,) * (
-                    num_cycles - len(partition_cubie_counts)
-                )
-            seen_cycle_cubie_counts = set()
-            # TODO: permuting can be done within integer_partitions itself
-            for all_permuted_partition_cubie_counts in itertools.product(
-                *map(unique_permutations, all_partition_cubie_counts)
+            for shared_cycle_combination in shared_cycle_combinations(
+                all_cycle_cubie_counts,
+                puzzle_orbit_definition,
+                even_parity_constraints_helper,
             ):
-                all_cycle_cubie_counts = []
-                continue_outer = False
-                for cubie_counts in zip(*all_permuted_partition_cubie_counts):
-                    # TODO(pri 5/5 blocked on derive all lesser): henry's faster impl
-                    if all(
-                        cubie_count == 0
-                        or orbit.orientation_status == OrientationStatus.CannotOrient()
-                        and cubie_count == 1
-                        for orbit, cubie_count in zip(
-                            puzzle_orbit_definition.orbits, cubie_counts
-                        )
-                    ):
-                        continue_outer = True
-                        break
-                    all_cycle_cubie_counts.append(cubie_counts)
-                if continue_outer:
+                # bit i is set when some cycle shares the orientation of orbit
+                # i, and when some cycle has a 1-cycle of orbit i to share it with
+                shared_orbits = 0
+                orbits_can_share = 0
+                for cycle in shared_cycle_combination:
+                    shared_orbits |= cycle.share
+                    orbits_can_share |= cycle.has_one & ~cycle.share
+                if shared_orbits & ~orbits_can_share:
                     continue
-                all_cycle_cubie_counts = tuple(
-                    sorted(all_cycle_cubie_counts, reverse=True)
+                share_orbit_counts = tuple(
+                    sum(cycle.share >> i & 1 for cycle in shared_cycle_combination)
+                    for i in range(num_orbits)
                 )
-                if all_cycle_cubie_counts in seen_cycle_cubie_counts:
-                    continue
-                seen_cycle_cubie_counts.add(all_cycle_cubie_counts)
-                for shared_cycle_combination in recursive_shared_cycle_combinations(
-                    all_cycle_cubie_counts,
-                    puzzle_orbit_definition,
-                    even_parity_constraints_helper,
+                # just because we sort the parititons earlier doesnt mean the
+                # orders will be sorted
+                descending_order_cycle_combination = sorted(
+                    shared_cycle_combination,
+                    key=lambda cycle: (cycle.order, cycle.partitions),
+                    reverse=True,
+                )
+                # permuting the cycles does not change the product
+                order_product = math.prod(
+                    cycle.order for cycle in descending_order_cycle_combination
+                )
+                highest_order = descending_order_cycle_combination[0].order
+                cycle_count = len(descending_order_cycle_combination)
+                for i, start_cycle_to_permute in enumerate(
+                    descending_order_cycle_combination
                 ):
-                    orbits_can_share = [False] * len(puzzle_orbit_definition.orbits)
-                    share_orbit_counts = [0] * len(puzzle_orbit_definition.orbits)
-                    for cycle in shared_cycle_combination:
-                        for i in range(len(puzzle_orbit_definition.orbits)):
-                            orbits_can_share[i] |= (
-                                cycle.share[i] is False
-                                and 1 in cycle.partition_objs[i].partition
-                            )
-                            share_orbit_counts[i] += cycle.share[i]
-                    if any(
-                        share_orbit_count != 0 and not orbit_can_share
-                        for share_orbit_count, orbit_can_share in zip(
-                            share_orbit_counts, orbits_can_share
+                    if i == 0:
+                        start_permuted_descending_order_cycle_combination = (
+                            descending_order_cycle_combination
                         )
-                    ):
-                        continue
-                    # just because we sort the parititons earlier doesnt mean the
-                    # orders will be sorted
-                    descending_order_cycle_combination = sorted(
-                        shared_cycle_combination,
-                        key=lambda cycle: (
-                            cycle.order,
-                            *map(
-                                operator.attrgetter("partition"),
-                                cycle.partition_objs,
-                            ),
-                        ),
-                        reverse=True,
-                    )
-                    for i, start_cycle_to_permute in enumerate(
-                        descending_order_cycle_combination
-                    ):
-                        if i == 0:
-                            start_permuted_descending_order_cycle_combination = (
-                                descending_order_cycle_combination
-                            )
-                        else:
-                            # We only permute the cycles that have the same maximum
-                            # order because the partition permutation for same order
-                            # cycles matters for the CCS. Don't permute the rest
-                            # because that logic is implemented in phase 3 (more
-                            # efficient to do this in phase 3 vs here).
-                            if (
-                                start_cycle_to_permute.order
-                                != descending_order_cycle_combination[0].order
-                            ):
-                                break
-                            if all(
-                                prev_cubie_partition == curr_cubie_partition
-                                for prev_cubie_partition, curr_cubie_partition in zip(
-                                    map(
-                                        operator.attrgetter("partition"),
-                                        descending_order_cycle_combination[
-                                            i - 1
-                                        ].partition_objs,
-                                    ),
-                                    map(
-                                        operator.attrgetter("partition"),
-                                        start_cycle_to_permute.partition_objs,
-                                    ),
-                                )
-                            ):
-                                continue
-                            start_permuted_descending_order_cycle_combination = (
-                                descending_order_cycle_combination.copy()
-                            )
-                            (
-                                start_permuted_descending_order_cycle_combination[0],
-                                start_permuted_descending_order_cycle_combination[i],
-                            ) = (
-                                start_permuted_descending_order_cycle_combination[i],
-                                start_permuted_descending_order_cycle_combination[0],
-                            )
-
-                        for j in range(len(puzzle_orbit_definition.orbits)):
-                            orbits_can_share[j] = False
-                        all_share_orbit_cycle_candidates = [
-                            [] for _ in range(len(puzzle_orbit_definition.orbits))
-                        ]
-
-                        order_product = 1
-                        for j, cycle in enumerate(
-                            start_permuted_descending_order_cycle_combination
+                    else:
+                        # We only permute the cycles that have the same maximum
+                        # order because the partition permutation for same order
+                        # cycles matters for the CCS. Don't permute the rest
+                        # because that logic is implemented in phase 3 (more
+                        # efficient to do this in phase 3 vs here).
+                        if start_cycle_to_permute.order != highest_order:
+                            break
+                        if (
+                            descending_order_cycle_combination[i - 1].partitions
+                            == start_cycle_to_permute.partitions
                         ):
-                            for k in range(len(puzzle_orbit_definition.orbits)):
-                                if (
-                                    orbits_can_share[k]
-                                    and 1 in cycle.partition_objs[k].partition
-                                ):
-                                    all_share_orbit_cycle_candidates[k].append(j)
-                                orbits_can_share[k] |= (
-                                    1 in cycle.partition_objs[k].partition
-                                )
-                            order_product *= cycle.order
-
-                        assert all(
-                            share_orbit_count == 0
-                            or len(share_orbit_cycle_candidates) != 0
-                            for share_orbit_cycle_candidates, share_orbit_count in zip(
-                                all_share_orbit_cycle_candidates, share_orbit_counts
-                            )
+                            continue
+                        start_permuted_descending_order_cycle_combination = (
+                            descending_order_cycle_combination.copy()
                         )
-
-                        share_orders = [
-                            tuple(
-                                tuple(
-                                    j in share_orbit_indicies
-                                    for share_orbit_indicies in all_share_orbit_indicies
-                                )
-                                for j in range(
-                                    len(
-                                        start_permuted_descending_order_cycle_combination
-                                    )
-                                )
-                            )
-                            for all_share_orbit_indicies in itertools.product(
-                                # given a list "share_edge_candidates", what are all ways to
-                                # pick "share_edge_count" numbers from the list
-                                *(
-                                    itertools.combinations(
-                                        share_orbit_cycle_candidates,
-                                        share_orbit_count,
-                                    )
-                                    for share_orbit_cycle_candidates, share_orbit_count in zip(
-                                        all_share_orbit_cycle_candidates,
-                                        share_orbit_counts,
-                                    )
-                                )
-                            )
-                        ]
-
-                        # According to
-                        # https://github.com/nestordemeure/paretoFront/blob/2aea69c371f70de4665f8abf24f6fda4ef0a8a70/src/pareto_front_implementation/pareto_front.rs#L265
-                        # it is not worth removing redundant cycles
-                        # intermediately
-                        cycle_combination_objs.append(
-                            CycleCombination(
-                                used_cubie_counts=used_cubie_counts,
-                                order_product=order_product,
-                                share_orders=share_orders,
-                                cycle_combination=start_permuted_descending_order_cycle_combination,
-                            )
+                        (
+                            start_permuted_descending_order_cycle_combination[0],
+                            start_permuted_descending_order_cycle_combination[i],
+                        ) = (
+                            start_permuted_descending_order_cycle_combination[i],
+                            start_permuted_descending_order_cycle_combination[0],
                         )
-    if cache_clear:
-        recursive_shared_cycle_combinations.cache_clear()
-        highest_order_cycles_from_cubie_counts.cache_clear()
-        reduced_integer_partitions.cache_clear()
-    return pareto_efficient_cycle_combinations(cycle_combination_objs)
 
+                    # bit j of the k-th mask is set when cycle j can share the
+                    # orientation of orbit k with an earlier cycle
+                    all_share_orbit_cycle_candidate_masks = [0] * num_orbits
+                    has_one_so_far = 0
+                    for j, cycle in enumerate(
+                        start_permuted_descending_order_cycle_combination
+                    ):
+                        share_candidate_orbits = cycle.has_one & has_one_so_far
+                        has_one_so_far |= cycle.has_one
+                        for k in range(num_orbits):
+                            if share_candidate_orbits >> k & 1:
+                                all_share_orbit_cycle_candidate_masks[k] |= 1 << j
+
+                    # every shared orbit has a candidate without checking: a
+                    # shared cycle always has a 1-cycle and the gate above found
+                    # an unshared one, so whichever of the two comes second is a
+                    # candidate in every permutation
 
-# do not flush cache it is used across used cubie counts
-@functools.cache
-def recursive_shared_cycle_combinations(
+                    share_orders = share_orders_from_candidates(
+                        tuple(all_share_orbit_cycle_candidate_masks),
+                        share_orbit_counts,
+                        cycle_count,
+                    )
+
+                    yield CycleCombination(
+                        used_cubie_counts=used_cubie_counts,
+                        order_product=order_product,
+                        share_orders=share_orders,
+                        cycle_combination=start_permuted_descending_order_cycle_combination,
+                    )
+
+
+def shared_cycle_combinations(
     all_cycle_cubie_counts, puzzle_orbit_definition, even_parity_constraints_helper
 ):
-    if len(all_cycle_cubie_counts) == 0:
-        return ((),)
+    return itertools.product(
+        *(
+            highest_order_cycles_from_cubie_counts(
+                cycle_cubie_counts,
+                puzzle_orbit_definition,
+                even_parity_constraints_helper,
+            )
+            for cycle_cubie_counts in all_cycle_cubie_counts
+        )
+    )
+
+
+# permuting the cycles usually leaves the candidates unchanged, so reuse the
+# share orders instead of recomputing the product of combinations
+@functools.cache
+def share_orders_from_candidates(
+    all_share_orbit_cycle_candidate_masks, share_orbit_counts, cycle_count
+):
     return tuple(
-        (shared_cycle,) + rest_combination
-        for shared_cycle in highest_order_cycles_from_cubie_counts(
-            all_cycle_cubie_counts[0],
-            puzzle_orbit_definition,
-            even_parity_constraints_helper,
+        tuple(
+            tuple(
+                share_orbit_mask >> j & 1 == 1
+                for share_orbit_mask in all_share_orbit_masks
+            )
+            for j in range(cycle_count)
         )
-        for rest_combination in recursive_shared_cycle_combinations(
-            all_cycle_cubie_counts[1:],
-            puzzle_orbit_definition,
-            even_parity_constraints_helper,
+        for all_share_orbit_masks in itertools.product(
+            # given a mask of "share_edge_candidates", what are all ways to
+            # pick "share_edge_count" bits from the mask
+            *(
+                sub_masks(share_orbit_cycle_candidate_mask, share_orbit_count)
+                for share_orbit_cycle_candidate_mask, share_orbit_count in zip(
+                    all_share_orbit_cycle_candidate_masks,
+                    share_orbit_counts,
+                )
+            )
         )
     )
 
 
+def sub_masks(mask, bit_count):
+    """
+    Find every sub mask of mask with bit_count bits set, in the same order as
+    itertools.combinations over the indicies of the set bits.
+    """
+    bits = [1 << j for j in range(mask.bit_length()) if mask >> j & 1]
+    return map(sum, itertools.combinations(bits, bit_count))
+
+
+# highest_order_cycles_from_cubie_counts and reduced_integer_partitions are
+# called for every cycle and for every orbit of every share combination, so they
+# are memoized on their integer arguments alone rather than also hashing the
+# puzzle orbit definition and the even parity constraints helper on every call.
+# The memos only ever hold the results of one puzzle and are reset whenever a
+# different one is passed in. The even parity constraints helper is derived from
+# the puzzle orbit definition and rebuilt on every search, so it is not part of
+# the owner.
+highest_order_cycles_memo = {}
+reduced_integer_partitions_memo = {}
+puzzle_memos_owner = None
+
+
+def claim_puzzle_memos(puzzle_orbit_definition):
+    global puzzle_memos_owner
+    if puzzle_memos_owner is not puzzle_orbit_definition:
+        highest_order_cycles_memo.clear()
+        reduced_integer_partitions_memo.clear()
+        interned_partitions.clear()
+        # the reduced integer partitions memo packs the orbit index into 7 bits
+        assert len(puzzle_orbit_definition.orbits) <= 128, puzzle_orbit_definition
+        puzzle_memos_owner = puzzle_orbit_definition
+
+
+def highest_order_cycles_from_cubie_counts(
+    cycle_cubie_counts, puzzle_orbit_definition, even_parity_constraints_helper
+):
+    claim_puzzle_memos(puzzle_orbit_definition)
+    shared_cycles = highest_order_cycles_memo.get(cycle_cubie_counts)
+    if shared_cycles is None:
+        shared_cycles = highest_order_cycles_memo[cycle_cubie_counts] = (
+            compute_highest_order_cycles_from_cubie_counts(
+                cycle_cubie_counts,
+                puzzle_orbit_definition,
+                even_parity_constraints_helper,
+            )
+        )
+    return shared_cycles
+
+
+def reduced_integer_partitions(
+    cycle_cubie_count,
+    orbit_index,
+    s,
+    puzzle_orbit_definition,
+    even_parity_constraints_helper,
+):
+    claim_puzzle_memos(puzzle_orbit_definition)
+    # packed into one int instead of allocating a tuple on every call, see the
+    # orbit count assertion in claim_puzzle_memos
+    key = (cycle_cubie_count << 7 | orbit_index) << 1 | s
+    reduced_partition_objs = reduced_integer_partitions_memo.get(key)
+    if reduced_partition_objs is None:
+        reduced_partition_objs = reduced_integer_partitions_memo[key] = (
+            compute_reduced_integer_partitions(
+                cycle_cubie_count,
+                orbit_index,
+                s,
+                puzzle_orbit_definition,
+                even_parity_constraints_helper,
+            )
+        )
+    return reduced_partition_objs
+
+
 # TODO(pri 3/5): on bigger cubes where the CCS is not applicable, do special
 # optimizations that make this faster. only find the highest order
 # product cycle dont care abt duplicates
-@functools.cache
-def highest_order_cycles_from_cubie_counts(
+def compute_highest_order_cycles_from_cubie_counts(
     cycle_cubie_counts, puzzle_orbit_definition, even_parity_constraints_helper
 ):
     shared_cycles = []
@@ -457,8 +650,10 @@ def highest_order_cycles_from_cubie_counts(
         if (
             cubie_count == 0
             # TODO(pri 3/5 blocked on deriving lesser): cubie_count == used_cubie_counts[i]
-            or puzzle_orbit_definition.orbits[i].orientation_status
-            == OrientationStatus.CannotOrient()
+            or isinstance(
+                puzzle_orbit_definition.orbits[i].orientation_status,
+                OrientationStatus.CannotOrient,
+            )
         ):
             share_states.append(ShareState.CANNOT_SHARE_ORIENTATION)
         elif cubie_count == 1:
@@ -466,92 +661,100 @@ def highest_order_cycles_from_cubie_counts(
         else:
             share_states.append(ShareState.FREE)
             free_share_count += 1
-    for free_share in itertools.product(
-        (False, True),
-        repeat=free_share_count,
-    ):
-        share = []
-        free_share_next_index = 0
-        for share_state in share_states:
+    for free_share in range(1 << free_share_count):
+        share = 0
+        free_share_next_index = free_share_count
+        for i, share_state in enumerate(share_states):
             match share_state:
                 case ShareState.FREE:
-                    share.append(free_share[free_share_next_index])
-                    free_share_next_index += 1
+                    free_share_next_index -= 1
+                    share |= (free_share >> free_share_next_index & 1) << i
                 case ShareState.CANNOT_SHARE_ORIENTATION:
-                    share.append(False)
+                    pass
                 case ShareState.MUST_SHARE_ORIENTATION:
-                    share.append(True)
+                    share |= 1 << i
         all_reduced_integer_partitions = [
             reduced_integer_partitions(
                 cycle_cubie_counts[i],
                 i,
-                share[i],
+                share >> i & 1 == 1,
                 puzzle_orbit_definition,
                 even_parity_constraints_helper,
             )
             for i in range(len(cycle_cubie_counts))
         ]
 
+        # the search below only ever looks at the order and parity of each
+        # partition, so flatten those out into plain ints once and only build
+        # the partition objects of the highest order cycles
+        all_partition_orders = [
+            tuple(map(operator.attrgetter("order"), reduced_partition_objs))
+            for reduced_partition_objs in all_reduced_integer_partitions
+        ]
+        all_partition_parity_masks = [
+            tuple(
+                (
+                    even_parity_constraints_helper.orbit_constraint_masks[i]
+                    if partition_obj.sign
+                    else 0
+                )
+                for partition_obj in reduced_partition_objs
+            )
+            for i, reduced_partition_objs in enumerate(all_reduced_integer_partitions)
+        ]
+
         rest_upper_bounds = []
         cycles = []
-        partition_obj_path = [None] * len(all_reduced_integer_partitions)
         rest_upper_bound = 1
 
-        for partition_obj in map(
-            operator.itemgetter(0), all_reduced_integer_partitions
-        ):
+        for partition_orders in all_partition_orders:
             rest_upper_bounds.append(rest_upper_bound)
-            rest_upper_bound *= partition_obj.order
+            rest_upper_bound *= partition_orders[0]
 
-        stack = [(len(all_reduced_integer_partitions) - 1, 1, None, 0)]
+        # partition_index_path holds the index of the partition chosen for every
+        # orbit after i, and bit c of constraint_parities is the parity of those
+        # partitions that are in the c-th even parity constraint
+        stack = [(len(all_reduced_integer_partitions) - 1, 1, (), 0, 0)]
         while stack:
-            i, running_order, partition_obj, next_even_parity_constraint_index = (
-                stack.pop()
-            )
-            if partition_obj is not None:
-                partition_obj_path[i + 1] = partition_obj
-            continue_outer = False
-            while (
-                next_even_parity_constraint_index
-                < len(even_parity_constraints_helper.first_constraint_indicies)
-                and i + 1
-                == even_parity_constraints_helper.first_constraint_indicies[
-                    next_even_parity_constraint_index
-                ]
-            ):
-                if (
-                    sign(partition_obj.partition)
-                    + sum(
-                        sign(partition)
-                        for j, partition in enumerate(
-                            map(
-                                operator.attrgetter("partition"),
-                                partition_obj_path[i + 2 :],
-                            )
-                        )
-                        if even_parity_constraints_helper.rest_constraint_flags[
-                            next_even_parity_constraint_index
-                        ][j]
-                    )
-                ) % 2 != 0:
-                    continue_outer = True
-                    break
-                next_even_parity_constraint_index += 1
-            if continue_outer:
-                continue
-
+            (
+                i,
+                running_order,
+                partition_index_path,
+                next_even_parity_constraint_index,
+                constraint_parities,
+            ) = stack.pop()
             if i != -1:
-                for partition_obj in all_reduced_integer_partitions[i]:
-                    rest_upper_bound = running_order * partition_obj.order
+                # every other orbit in a constraint has a higher index so its
+                # parity is complete once its first orbit is chosen, and
+                # partitions that would leave it odd are never pushed
+                complete_constraints_mask = 0
+                while (
+                    next_even_parity_constraint_index
+                    < len(even_parity_constraints_helper.first_constraint_indicies)
+                    and i
+                    == even_parity_constraints_helper.first_constraint_indicies[
+                        next_even_parity_constraint_index
+                    ]
+                ):
+                    complete_constraints_mask |= 1 << next_even_parity_constraint_index
+                    next_even_parity_constraint_index += 1
+                partition_parity_masks = all_partition_parity_masks[i]
+                for partition_index, order in enumerate(all_partition_orders[i]):
+                    rest_upper_bound = running_order * order
                     if rest_upper_bound * rest_upper_bounds[i] < highest_order:
                         break
+                    next_constraint_parities = (
+                        constraint_parities ^ partition_parity_masks[partition_index]
+                    )
+                    if next_constraint_parities & complete_constraints_mask:
+                        continue
                     stack.append(
                         (
                             i - 1,
-                            rest_upper_bound
-                            // math.gcd(running_order, partition_obj.order),
-                            partition_obj,
+                            rest_upper_bound // math.gcd(running_order, order),
+                            (partition_index,) + partition_index_path,
                             next_even_parity_constraint_index,
+                            next_constraint_parities,
                         )
                     )
                 continue
@@ -560,19 +763,40 @@ def highest_order_cycles_from_cubie_counts(
             if running_order < highest_order:
                 continue
             highest_order = running_order
+            partition_obj_path = tuple(
+                reduced_partition_objs[partition_index]
+                for reduced_partition_objs, partition_index in zip(
+                    all_reduced_integer_partitions, partition_index_path
+                )
+            )
             cycles.append(
                 Cycle(
                     order=running_order,
                     share=share,
-                    partition_objs=partition_obj_path.copy(),
+                    has_one=sum(
+                        1 << j
+                        for j, partition_obj in enumerate(partition_obj_path)
+                        if 1 in partition_obj.partition
+                    ),
+                    partition_objs=partition_obj_path,
+                    partitions=tuple(
+                        partition_obj.partition for partition_obj in partition_obj_path
+                    ),
                 )
             )
         shared_cycles.extend(cycles)
-    return shared_cycles
+    return tuple(shared_cycles)
 
 
-@functools.cache
-def reduced_integer_partitions(
+# shared partitions are rebuilt for every orbit and can equal the unshared
+# partitions of one more cubie, so all of them are interned here. equal
+# partitions are then the same object, and comparing them or the partitions of
+# cycles built from them stops at an identity check. it is reset along with the
+# memos above
+interned_partitions = {}
+
+
+def compute_reduced_integer_partitions(
     cycle_cubie_count,
     orbit_index,
     s,
@@ -584,8 +808,8 @@ def reduced_integer_partitions(
     for partition in integer_partitions(cycle_cubie_count):
         if s:
             partition = (1,) + partition
-        lcm = math.lcm(*partition)
-        order = lcm
+        partition = interned_partitions.setdefault(partition, partition)
+        order = partition_lcm(partition)
 
         always_orient = None
         critical_orient = None
@@ -645,56 +869,112 @@ def reduced_integer_partitions(
                 order=order,
                 always_orient=always_orient,
                 critical_orient=critical_orient,
+                sign=sign(partition),
             )
         )
 
     partition_objs.sort(reverse=True, key=operator.attrgetter("order"))
+    # partitions of different signs never dominate each other in an orbit with
+    # an even parity constraint, so only compare those with the same sign
+    if even_parity_constraints_helper.constraint_orbit_flags[orbit_index]:
+        all_sign_partition_indicies = ([], [])
+        for i, partition_obj in enumerate(partition_objs):
+            all_sign_partition_indicies[partition_obj.sign].append(i)
+    else:
+        all_sign_partition_indicies = (range(len(partition_objs)),)
     dominated = [False] * len(partition_objs)
-    reduced_partition_objs = []
-    for i in range(len(partition_objs)):
-        if dominated[i]:
-            continue
-        curr_partition_obj = partition_objs[i]
-        reduced_partition_objs.append(curr_partition_obj)
-        for j in range(i + 1, len(partition_objs)):
-            if (
-                curr_partition_obj.order % partition_objs[j].order == 0
-                and curr_partition_obj.order != partition_objs[j].order
-                and (
-                    not even_parity_constraints_helper.constraint_orbit_flags[
-                        orbit_index
-                    ]
-                    or (
-                        sign(curr_partition_obj.partition)
-                        + sign(partition_objs[j].partition)
-                    )
-                    % 2
-                    == 0
-                )
-            ):
-                dominated[j] = True
-    return reduced_partition_objs
+    for sign_partition_indicies in all_sign_partition_indicies:
+        for k, i in enumerate(sign_partition_indicies):
+            if dominated[i]:
+                continue
+            order = partition_objs[i].order
+            for j in sign_partition_indicies[k + 1 :]:
+                if (
+                    order % partition_objs[j].order == 0
+                    and order != partition_objs[j].order
+                ):
+                    dominated[j] = True
+    return tuple(
+        partition_obj
+        for partition_obj, partition_dominated in zip(partition_objs, dominated)
+        if not partition_dominated
+    )
 
 
 def pareto_efficient_cycle_combinations(cycle_combination_objs):
-    # This isnt the exact pareto efficient algorithm because I had trouble
-    # getting it to work for some reason. The actual algorithm will be used in
-    # the Rust verison of this code.
-    cycle_combination_objs.sort(
-        key=lambda cycle_combination_obj: (
-            cycle_combination_obj.order_product,
-            *map(operator.attrgetter("order"), cycle_combination_obj.cycle_combination),
-        ),
-        reverse=True,
-    )
-    pareto_points = []
-    for maybe_redundant in cycle_combination_objs:
-        if all(
-            not cycle_combination_dominates(not_redundant, maybe_redundant)
-            for not_redundant in pareto_points
-        ):
-            pareto_points.append(maybe_redundant)
-    return pareto_points
+    pareto_front = ParetoFront()
+    for cycle_combination_obj in cycle_combination_objs:
+        pareto_front.add(cycle_combination_obj)
+    return pareto_front.cycle_combination_objs()
+
+
+class ParetoFront:
+    """
+    The pareto efficient cycle combinations of those added so far, with a
+    modification: a cycle combination is also redundant when an earlier one has
+    the same orders, share orders and partitions.
+
+    Dominated cycle combinations are dropped as soon as they are added, so only
+    the front is ever held in memory.
+    """
+
+    def __init__(self):
+        # the orders of the cycles on the front, mapped to the first cycle
+        # combination of every share order and partitions with those orders
+        self.front = {}
+        # orders only ever leave the front when they are dominated, so every
+        # order seen once and not on the front stays dominated
+        self.dominated_orders = set()
+
+    def add(self, cycle_combination_obj):
+        orders = tuple(
+            map(operator.attrgetter("order"), cycle_combination_obj.cycle_combination)
+        )
+        same_orders_cycle_combination_objs = self.front.get(orders)
+        if same_orders_cycle_combination_objs is None:
+            if orders in self.dominated_orders:
+                return
+            if any(
+                all(map(operator.ge, front_orders, orders))
+                for front_orders in self.front
+            ):
+                self.dominated_orders.add(orders)
+                return
+            for front_orders in [
+                front_orders
+                for front_orders in self.front
+                if all(map(operator.ge, orders, front_orders))
+            ]:
+                del self.front[front_orders]
+                self.dominated_orders.add(front_orders)
+            same_orders_cycle_combination_objs = self.front[orders] = {}
+        same_orders_cycle_combination_objs.setdefault(
+            (
+                cycle_combination_obj.share_orders,
+                tuple(
+                    cycle.partitions
+                    for cycle in cycle_combination_obj.cycle_combination
+                ),
+            ),
+            cycle_combination_obj,
+        )
+
+    def cycle_combination_objs(self):
+        return sorted(
+            (
+                cycle_combination_obj
+                for same_orders_cycle_combination_objs in self.front.values()
+                for cycle_combination_obj in same_orders_cycle_combination_objs.values()
+            ),
+            key=lambda cycle_combination_obj: (
+                cycle_combination_obj.order_product,
+                *map(
+                    operator.attrgetter("order"),
+                    cycle_combination_obj.cycle_combination,
+                ),
+            ),
+            reverse=True,
+        )
 
 
 def cycle_combination_objs_stats(cycle_combination_objs):
@@ -711,26 +991,58 @@ def cycle_combination_objs_stats(cycle_combination_objs):
     return dict(stats)
 
 
-def main():
-    start = timeit.default_timer()
-    cycle_combinations = optimal_cycle_combinations(
-        puzzle_orbit_definition=puzzle_orbit_definitions.PUZZLE_3x3,
-        num_cycles=2,
-    )
-    print(timeit.default_timer() - start)
-    print(recursive_shared_cycle_combinations.cache_info())
-    print(highest_order_cycles_from_cubie_counts.cache_info())
-    print(reduced_integer_partitions.cache_info())
-    return cycle_combinations
+def batch_optimal_cycle_combinations(tasks, processes=None):
+    # each (puzzle orbit definition, number of cycles) task is independent and
+    # CPU bound, so they run in separate processes to get around the GIL
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        return list(
+            executor.map(optimal_cycle_combinations, *zip(*tasks)),
+        )
 
 
-if __name__ == "__main__":
-    cycle_combination_objs = main()
-    try:
-        stats = cycle_combination_objs_stats(cycle_combination_objs)
-    except Exception:
-        stats = None
+def write_output(all_cycle_combination_objs):
+    # pickled because building and later importing the repr of every cycle
+    # combination is slow. output.py only holds the stats and loads the rest
+    with open("./output.pkl", "wb") as f:
+        pickle.dump(all_cycle_combination_objs, f, protocol=5)
+    all_stats = []
+    for cycle_combination_objs in all_cycle_combination_objs:
+        try:
+            all_stats.append(cycle_combination_objs_stats(cycle_combination_objs))
+        except Exception:
+            all_stats.append(None)
     with open("./output.py", "w") as f:
         f.write(
-            f"Cycle = 1\nCycleCombination = 1\nCubiePartition = 1\n{stats}\n{cycle_combination_objs}"
+            f"# Run `python -i output.py`\nimport pickle\n\nall_stats = {all_stats}\n"
+            'with open("output.pkl", "rb") as f:\n'
+            "    all_cycle_combination_objs = pickle.load(f)\n"
         )
+
+
+def main():
+    tasks = [
+        (puzzle_orbit_definitions.PUZZLE_3x3, 2),
+    ]
+    phase_times = {}
+    start = time.perf_counter_ns()
+    all_cycle_combination_objs = batch_optimal_cycle_combinations(tasks)
+    phase_times["search"] = time.perf_counter_ns() - start
+    start = time.perf_counter_ns()
+    write_output(all_cycle_combination_objs)
+    phase_times["write"] = time.perf_counter_ns() - start
+    for phase, phase_time in phase_times.items():
+        print(f"{phase}: {phase_time / 1e9:.6f}s")
+    return all_cycle_combination_objs
+
+
+if __name__ == "__main__":
+    # Run as a script, this file is the __main__ module, so the classes defined
+    # here would be pickled into output.pkl as __main__.<name>, which the
+    # generated output.py cannot load. The results sent back by the process
+    # pool workers would be __main__ classes too. Importing the file under its
+    # own name and running main from there makes everything refer to
+    # optimal_combination_structures instead. The module is executed twice as
+    # a result, but the __main__ copy does nothing besides this import.
+    import optimal_combination_structures
+
+    optimal_combination_structures.main()
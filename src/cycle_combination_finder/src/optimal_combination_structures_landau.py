@@ -153,29 +153,54 @@ def integer_partitions(n):
     to integer partitions, this can also be thought of as a representation of the
     conjugacy classes of those symmetric groups.
 
-    Taken from <https://stackoverflow.com/a/10036764/12230735>.
+    Each partition is generated exactly once, in ascending order, with Kelleher's
+    ascending composition algorithm. Taken from
+    <https://jeromekelleher.net/generating-integer-partitions.html>.
     """
     if n == 0:
-        return {()}
-    answer = {(n,)}
-    for x in range(1, n):
-        for y in integer_partitions(n - x):
-            answer.add(tuple(sorted((x,) + y)))
-    return answer
-
-
-# https://stackoverflow.com/a/6285330/12230735
-def unique_permutations(iterable, skip, r=None):
+        return ((),)
+    partitions = []
+    a = [0] * (n + 1)
+    k = 1
+    a[1] = n
+    while k != 0:
+        x = a[k - 1] + 1
+        y = a[k] - 1
+        k -= 1
+        while x <= y:
+            a[k] = x
+            y -= x
+            k += 1
+        a[k] = x + y
+        partitions.append(tuple(a[: k + 1]))
+    return tuple(partitions)
+
+
+def unique_permutations(iterable, skip):
+    """
+    Find the distinct permutations of iterable in lexicographic order with
+    Narayana Pandita's next permutation algorithm, so repeated elements never
+    generate duplicates that have to be filtered out.
+    """
     if skip:
         yield iterable
-    else:
-        previous = ()
-        for p in itertools.permutations(sorted(iterable), r):
-            if p > previous:
-                previous = p
-                yield p
+        return
+    a = sorted(iterable)
+    while True:
+        yield tuple(a)
+        i = len(a) - 2
+        while i >= 0 and a[i] >= a[i + 1]:
+            i -= 1
+        if i < 0:
+            return
+        j = len(a) - 1
+        while a[j] <= a[i]:
+            j -= 1
+        a[i], a[j] = a[j], a[i]
+        a[i + 1 :] = reversed(a[i + 1 :])
 
 
+@functools.cache
 def p_adic_valuation(n, p):
     """
     Calculate the [p-adic valuation](https://en.wikipedia.org/wiki/P-adic_valuation).
@@ -187,6 +212,14 @@ def p_adic_valuation(n, p):
     return exponent
 
 
+@functools.cache
+def partition_lcm(partition):
+    """
+    Calculate the order of a permutation with the given cycle lengths.
+    """
+    return math.lcm(*partition)
+
+
 @functools.cache
 def sign(partition):
     """
@@ -206,20 +239,15 @@ def cycle_combination_dominates(this, other):
             return False
         if different_orders:
             continue
-        different_orders |= this_cycle.order > other_cycle.order
-        same_cycle &= all(
-            this_cubie_partition == other_cubie_partition
-            for this_cubie_partition, other_cubie_partition in zip(
-                map(
-                    operator.attrgetter("partition"),
-                    this_cycle.partition_objs,
-                ),
-                map(
-                    operator.attrgetter("partition"),
-                    other_cycle.partition_objs,
-                ),
-            )
-        )
+        different_orders = this_cycle.order > other_cycle.order
+        if not same_cycle:
+            continue
+        for this_partition_obj, other_partition_obj in zip(
+            this_cycle.partition_objs, other_cycle.partition_objs
+        ):
+            if this_partition_obj.partition != other_partition_obj.partition:
+                same_cycle = False
+                break
 
     return different_orders or same_cycle
 
@@ -742,7 +770,7 @@ def reduced_integer_partitions(
         partition = tuple(remaining_partition + starting_partition)
         if s:
             partition = (1,) + partition
-        order = math.lcm(*partition)
+        order = partition_lcm(partition)
 
         # print('bbb',partition)
         always_orient = None
@@ -847,12 +875,32 @@ def pareto_efficient_cycle_combinations(cycle_combination_objs):
         reverse=True,
     )
     pareto_points = []
+    # the orders of the cycles of every pareto point, mapped to the pareto
+    # points with those orders
+    all_same_orders_pareto_points = {}
     for maybe_redundant in cycle_combination_objs:
-        if all(
-            not cycle_combination_dominates(not_redundant, maybe_redundant)
-            for not_redundant in pareto_points
+        orders = tuple(
+            map(operator.attrgetter("order"), maybe_redundant.cycle_combination)
+        )
+        same_orders_pareto_points = all_same_orders_pareto_points.get(orders)
+        if same_orders_pareto_points is None:
+            # anything with greater or equal orders has a greater order product
+            # so it was already seen, and only the orders need to be compared
+            if any(
+                all(map(operator.ge, pareto_orders, orders))
+                for pareto_orders in all_same_orders_pareto_points
+            ):
+                continue
+            same_orders_pareto_points = all_same_orders_pareto_points[orders] = []
+        # and nothing with strictly greater orders was kept, otherwise it would
+        # have dominated the pareto points with these orders too
+        elif any(
+            cycle_combination_dominates(not_redundant, maybe_redundant)
+            for not_redundant in same_orders_pareto_points
         ):
-            pareto_points.append(maybe_redundant)
+            continue
+        same_orders_pareto_points.append(maybe_redundant)
+        pareto_points.append(maybe_redundant)
     return pareto_points
 
 
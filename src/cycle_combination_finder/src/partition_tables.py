@@ -0,0 +1,206 @@
+"""
+Partition tables and puzzle definitions searched by best_lcm_testing.py.
+"""
+
+import functools
+import math
+import operator
+
+
+@functools.cache
+def p_adic_valuation(n, p):
+    exponent = 0
+    while n % p == 0 and n != 0:
+        n //= p
+        exponent += 1
+    return exponent
+
+
+def sign(partition):
+    # parity of a permutation with these cycle lengths, which is the number of
+    # even length cycles mod 2
+    return (sum(partition) - len(partition)) & 1
+
+
+@functools.cache
+def integer_partitions(n):
+    if n == 0:
+        return ((),)
+    partitions = []
+    a = [0] * (n + 1)
+    k = 1
+    a[1] = n
+    while k != 0:
+        x = a[k - 1] + 1
+        y = a[k] - 1
+        k -= 1
+        while x <= y:
+            a[k] = x
+            y -= x
+            k += 1
+        a[k] = x + y
+        partitions.append(tuple(a[: k + 1]))
+    return tuple(partitions)
+
+
+def partition_order(partition, orientation_count):
+    lcm = math.lcm(*partition)
+    if orientation_count == 1:
+        return lcm
+    order = lcm
+
+    always_orient = None
+    critical_orient = None
+    max_p_adic_valuation = -1
+
+    for j, permutation_order in enumerate(partition):
+        curr_p_adic_valuation = p_adic_valuation(
+            permutation_order,
+            orientation_count,
+        )
+        if curr_p_adic_valuation > max_p_adic_valuation:
+            max_p_adic_valuation = curr_p_adic_valuation
+            critical_orient = [j]
+        elif curr_p_adic_valuation == max_p_adic_valuation:
+            critical_orient.append(j)
+        if permutation_order == 1:
+            if always_orient is None:
+                always_orient = [j]
+            else:
+                always_orient.append(j)
+
+    orient_count = 0 if always_orient is None else len(always_orient)
+    critical_is_disjoint = critical_orient is not None and (
+        always_orient is None or all(j not in always_orient for j in critical_orient)
+    )
+    if critical_is_disjoint:
+        orient_count += 1
+    unorient_critical = orient_count == len(partition) and (
+        orientation_count == 2
+        and orient_count % 2 == 1
+        or orientation_count > 2
+        and orient_count == 1
+    )
+    if unorient_critical:
+        if critical_is_disjoint:
+            return order
+        else:
+            return None
+    else:
+        if orient_count == 0:
+            return order
+        else:
+            return order * orientation_count
+
+
+def full_integer_partitions(cycle_cubie_count, orientation_count):
+    partitions = [
+        (order, partition)
+        for partition in integer_partitions(cycle_cubie_count)
+        if (order := partition_order(partition, orientation_count)) is not None
+    ]
+    partitions.sort(reverse=True, key=operator.itemgetter(0))
+    return partitions
+
+
+def reduced_integer_partitions(cycle_cubie_count, orientation_count, parity_aware):
+    partitions = full_integer_partitions(cycle_cubie_count, orientation_count)
+    signs = [sign(partition) for _, partition in partitions]
+
+    dominated = [False] * len(partitions)
+    reduced_partitions = []
+    for i in range(len(partitions)):
+        if dominated[i]:
+            continue
+        partition = partitions[i]
+        reduced_partitions.append(partition)
+        for j in range(i + 1, len(partitions)):
+            if (
+                partition[0] % partitions[j][0] == 0
+                and partition[0] != partitions[j][0]
+                and (not parity_aware or signs[i] == signs[j])
+            ):
+                dominated[j] = True
+    return reduced_partitions
+
+
+# list of (order, partition of N)
+# example:
+# corners_constraint == [(45, (3, 5)), (36, (1, 3, 4)), (30, (1, 2, 5)), (21, (1, 7)), (18, (1, 2, 2, 3)), (18, (2, 6)), (12, (1, 1, 2, 4)), (12, (4, 4)), (8, (8,))]
+
+edges_constraint = tuple(reduced_integer_partitions(12, 2, True))
+corners_constraint = tuple(reduced_integer_partitions(8, 3, True))
+s24_noconstraint = tuple(reduced_integer_partitions(24, 1, False))
+s24_constraint = tuple(reduced_integer_partitions(24, 1, True))
+# TODO: asher and I discussed needing the full integer partitions for larger
+# cubes. this is unfortunately very very slow
+# edges_constraint = full_integer_partitions(12, 2)
+# corners_constraint = full_integer_partitions(8, 3)
+# s24_noconstraint = full_integer_partitions(24, 1)
+# s24_constraint = full_integer_partitions(24, 1)
+
+# the first element of the tuple is the index where everything then and after
+# wards are identical orbits (s24). This is used to enforce a constraint that
+# the partitions must be in ascending order for these orbits to avoid duplicates
+
+
+_3x3 = (
+    2,
+    (
+        edges_constraint,
+        corners_constraint,
+    ),
+)
+
+_4x4 = (
+    1,
+    (
+        corners_constraint,
+        s24_noconstraint,
+        s24_constraint,
+    ),
+)
+
+_5x5 = (
+    2,
+    (
+        edges_constraint,
+        corners_constraint,
+        s24_constraint,
+        s24_constraint,
+        s24_constraint,
+    ),
+)
+
+
+_6x6 = (
+    1,
+    (
+        corners_constraint,
+        # these *should* be s24_constraint but it's really slow :(
+        s24_noconstraint,
+        s24_noconstraint,
+        s24_noconstraint,
+        s24_noconstraint,
+        s24_noconstraint,
+        s24_noconstraint,
+    ),
+)
+
+# GOAL: make 7x7 and onwards fast
+
+_7x7 = (
+    2,
+    (
+        edges_constraint,
+        corners_constraint,
+        s24_noconstraint,
+        s24_noconstraint,
+        s24_noconstraint,
+        s24_noconstraint,
+        s24_noconstraint,
+        s24_noconstraint,
+        s24_noconstraint,
+        s24_noconstraint,
+    ),
+)
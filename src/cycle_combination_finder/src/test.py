@@ -1,6 +1,12 @@
 import unittest
 import puzzle_orbit_definitions as puzzle_orbit_definitions
 import optimal_combination_structures
+
+try:
+    import optimal_combination_structures_landau
+except ModuleNotFoundError:
+    # needs sympy
+    optimal_combination_structures_landau = None
 from common_types import (
     PuzzleOrbitDefinition,
     Orbit,
@@ -10,6 +16,33 @@ from common_types import (
 )
 
 unittest.util._MAX_LENGTH = 500
+unittest.TestCase.maxDiff = None
+
+
+class Puzzle_2x2(unittest.TestCase):
+    def test_2x2_2_cycles_kept_cycle_combinations(self):
+        # equivalent cycle combinations are deduplicated by keeping the first
+        # one found, so this pins down which one that is and the order of ties
+        cycle_combination_objs = (
+            optimal_combination_structures.optimal_cycle_combinations(
+                puzzle_orbit_definition=puzzle_orbit_definitions.PUZZLE_2x2,
+                num_cycles=2,
+            )
+        )
+        self.assertEqual(
+            [
+                [
+                    (cycle.order, cycle.share, cycle.partitions)
+                    for cycle in cycle_combination_obj.cycle_combination
+                ]
+                for cycle_combination_obj in cycle_combination_objs
+            ],
+            [
+                [(18, 0, ((1, 2, 3),)), (6, 1, ((1, 2),))],
+                [(18, 0, ((2, 3),)), (6, 0, ((1, 2),))],
+                [(12, 1, ((1, 4),)), (9, 0, ((1, 3),))],
+            ],
+        )
 
 
 class Puzzle_3x3(unittest.TestCase):
@@ -81,6 +114,44 @@ class Puzzle_3x3(unittest.TestCase):
             },
         )
 
+    def test_3x3_3_cycles_parallel(self):
+        cycle_combination_objs = (
+            optimal_combination_structures.optimal_cycle_combinations(
+                puzzle_orbit_definition=puzzle_orbit_definitions.PUZZLE_3x3,
+                num_cycles=3,
+                processes=2,
+            )
+        )
+        # imap hands back the pareto front of every used cubie count in the
+        # serial order, so the exact same cycle combinations come back
+        self.assertEqual(
+            cycle_combination_objs,
+            optimal_combination_structures.optimal_cycle_combinations(
+                puzzle_orbit_definition=puzzle_orbit_definitions.PUZZLE_3x3,
+                num_cycles=3,
+            ),
+        )
+        stats = optimal_combination_structures.cycle_combination_objs_stats(
+            cycle_combination_objs
+        )
+        self.assertEqual(
+            stats,
+            {
+                (90, 90, 6): 1,
+                (90, 30, 18): 1,
+                (30, 30, 30): 2,
+                (180, 18, 6): 2,
+                (126, 12, 12): 1,
+                (630, 9, 3): 1,
+                (210, 9, 9): 1,
+                (36, 36, 12): 1,
+                (126, 36, 3): 2,
+                (42, 36, 9): 2,
+                (360, 6, 6): 4,
+                (210, 15, 3): 1,
+            },
+        )
+
     def test_3x3_4_cycles(self):
         cycle_combination_objs = (
             optimal_combination_structures.optimal_cycle_combinations(
@@ -337,6 +408,109 @@ class NoConstraints(unittest.TestCase):
             },
         )
 
+    def test_two_orbits_3_cycles_kept_cycle_combinations(self):
+        # the cycle cubie counts are zipped together from more than one orbit,
+        # and the order they are produced in decides the order of tied cycle
+        # combinations and which of two equivalent ones is kept
+        cycle_combination_objs = (
+            optimal_combination_structures.optimal_cycle_combinations(
+                puzzle_orbit_definition=PuzzleOrbitDefinition(
+                    orbits=(
+                        Orbit(
+                            name="A",
+                            cubie_count=5,
+                            orientation_status=OrientationStatus.CannotOrient(),
+                        ),
+                        Orbit(
+                            name="B",
+                            cubie_count=5,
+                            orientation_status=OrientationStatus.CannotOrient(),
+                        ),
+                    ),
+                    even_parity_constraints=(),
+                ),
+                num_cycles=3,
+            )
+        )
+        self.assertEqual(
+            [
+                (
+                    [
+                        (cycle.order, cycle.share, cycle.partitions)
+                        for cycle in cycle_combination_obj.cycle_combination
+                    ],
+                    cycle_combination_obj.used_cubie_counts,
+                )
+                for cycle_combination_obj in cycle_combination_objs
+            ],
+            [
+                (
+                    [(6, 0, ((3,), (2,))), (3, 0, ((), (3,))), (2, 0, ((2,), ()))],
+                    (5, 5),
+                ),
+                (
+                    [(6, 0, ((2,), (3,))), (3, 0, ((3,), ())), (2, 0, ((), (2,)))],
+                    (5, 5),
+                ),
+                (
+                    [(6, 0, ((), (2, 3))), (3, 0, ((3,), ())), (2, 0, ((2,), ()))],
+                    (5, 5),
+                ),
+                (
+                    [(6, 0, ((2, 3), ())), (3, 0, ((), (3,))), (2, 0, ((), (2,)))],
+                    (5, 5),
+                ),
+            ],
+        )
+
+
+@unittest.skipIf(
+    optimal_combination_structures_landau is None, "sympy is not installed"
+)
+class Landau(unittest.TestCase):
+    def test_2x2_3_cycles_kept_cycle_combinations(self):
+        # equivalent cycle combinations are deduplicated by keeping the first
+        # one found, so this pins down which one that is and the order of ties
+        cycle_combination_objs = (
+            optimal_combination_structures_landau.optimal_cycle_combinations(
+                puzzle_orbit_definition=puzzle_orbit_definitions.PUZZLE_2x2,
+                num_cycles=3,
+            )
+        )
+        self.assertEqual(
+            [
+                [
+                    (
+                        cycle.order,
+                        cycle.share,
+                        tuple(
+                            partition_obj.partition
+                            for partition_obj in cycle.partition_objs
+                        ),
+                    )
+                    for cycle in cycle_combination_obj.cycle_combination
+                ]
+                for cycle_combination_obj in cycle_combination_objs
+            ],
+            [
+                [
+                    (9, [False], ((1, 3),)),
+                    (6, [True], ((1, 2),)),
+                    (6, [True], ((1, 2),)),
+                ],
+                [
+                    (9, [False], ((1, 3),)),
+                    (9, [True], ((1, 3),)),
+                    (3, [True], ((1, 1),)),
+                ],
+                [
+                    (18, [False], ((2, 3),)),
+                    (3, [False], ((1, 1),)),
+                    (3, [True], ((1, 1),)),
+                ],
+            ],
+        )
+
 
 if __name__ == "__main__":
     unittest.main()